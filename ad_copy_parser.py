@@ -0,0 +1,133 @@
+"""
+Parser for the Google Ads assets text returned by the ad copy Gemini call.
+
+Kept in its own module so it is imported once per server process; the parse cache below survives Streamlit reruns.
+"""
+
+import functools
+import re
+
+_SECTION_TITLES = ("AD COPY VARIATION", "SITELINKS", "STRUCTURED SNIPPETS", "CALLOUTS")
+# A title line starts with a title (variations may be numbered) followed by the end of the line or a separator,
+# e.g. "AD COPY VARIATION 2: Repairs", "**CALLOUTS** (3 variations)" or "AD COPY VARIATION 1 - Plumbing".
+# Prose that merely starts with a title word ("Callouts highlight free shipping") is not one.
+_TITLE_LINE = re.compile(
+    r"(?:AD COPY VARIATION(?:\s*#?\d+)?|SITELINKS|STRUCTURED SNIPPETS|CALLOUTS)\s*(?:$|[:(*\-–—])",
+    re.IGNORECASE,
+)
+# Labels are only ever matched by prefix, and none is longer than this, so only this much is upper-cased
+_PREFIX_LEN = 24
+
+class AdCopyParser:
+    """
+    Incremental single-pass parser for the ad copy response, fed one line at a time so sections can be
+    displayed while the rest of the response is still streaming.
+    Ad copy variations map to {"headlines": [...], "descriptions": [...]}, structured snippets to a list of
+    (header, values, lines) triples, where lines keeps any other text under the header (e.g. "Values: X, Y"),
+    and sitelinks/callouts to their raw text.
+    """
+
+    def __init__(self):
+        self.sections = {}
+        self._text_titles = set()
+        self._title = None
+        self._state = None  # "variation", "snippets" or "text"
+        self._items = None  # list collecting the '- ' items of the current block
+        self._lines = None  # list collecting the other lines of the current snippet header
+
+    def feed(self, line: str):
+        """Consumes one line. Returns the title of the section it closes when the line starts a new one, else None."""
+        stripped = line.strip()
+        if not stripped:
+            # Blank lines only matter inside text sections, where they separate entries
+            if self._state == "text":
+                self.sections[self._title].append("")
+            return None
+
+        # Tolerate markdown emphasis/headings around titles and labels (e.g. "**Headlines:**", "## SITELINKS")
+        label = stripped.strip('*#').strip()
+        label_upper = label[:_PREFIX_LEN].upper()
+
+        # The prefix check is cheap and rules out most lines before the full title match
+        if label_upper.startswith(_SECTION_TITLES) and _TITLE_LINE.match(label):
+            closed_title = self._title
+            self._title = label.replace('*', '').rstrip(':').strip()
+            self._items = self._lines = None
+            # A repeated title continues its earlier section instead of replacing it
+            if label_upper.startswith("AD COPY VARIATION"):
+                self._state = "variation"
+                self.sections.setdefault(self._title, {"headlines": [], "descriptions": []})
+            elif label_upper.startswith("STRUCTURED SNIPPETS"):
+                self._state = "snippets"
+                self.sections.setdefault(self._title, [])
+            else:
+                self._state = "text"
+                if self._title not in self.sections:
+                    self.sections[self._title] = []
+                    self._text_titles.add(self._title)
+            return closed_title
+
+        if self._state == "variation":
+            if label_upper.startswith("HEADLINES"):
+                self._items = self.sections[self._title]["headlines"]
+            elif label_upper.startswith("DESCRIPTIONS"):
+                self._items = self.sections[self._title]["descriptions"]
+            elif self._items is not None and stripped.startswith('- '):
+                self._items.append(stripped[2:].strip())
+        elif self._state == "snippets":
+            if label_upper.startswith("HEADER:"):
+                self._items, self._lines = [], []
+                self.sections[self._title].append((label[7:].strip(' *:'), self._items, self._lines))
+            else:
+                if self._items is None:
+                    self._items, self._lines = [], []
+                    self.sections[self._title].append(("", self._items, self._lines))
+                if stripped.startswith('- '):
+                    self._items.append(stripped[2:].strip())
+                else:
+                    self._lines.append(stripped)
+        elif self._state == "text":
+            self.sections[self._title].append(line.rstrip())
+        # Any intro text before the first section is not displayed
+        return None
+
+    def close(self):
+        """Ends the input and returns the title of the section that was still open, if any."""
+        closed_title = self._title
+        self._title = self._state = self._items = self._lines = None
+        return closed_title
+
+    def section(self, title: str):
+        """Returns the parsed content of a section; text sections collect lines and are joined on demand."""
+        content = self.sections[title]
+        if title in self._text_titles:
+            return '\n'.join(content).strip()
+        return content
+
+def section_has_content(content) -> bool:
+    """Returns whether a parsed section has anything to display beyond its title."""
+    if isinstance(content, dict):
+        return any(content.values())
+    if isinstance(content, list):
+        return any(any(entry) for entry in content)
+    return bool(content)
+
+# Keyed by the raw response text, so re-rendering a cached Gemini response does not parse it again.
+# Returns (title, content) pairs rather than a dict; the cached result is shared, so callers must treat it as read-only.
+@functools.lru_cache(maxsize=16)
+def parse_ad_copy_text(raw_text: str) -> tuple:
+    """Parses a complete ad copy response into (title, content) pairs of its structured sections (see AdCopyParser)."""
+    # The line scan is skipped when no section title appears anywhere in the response (e.g. a refusal)
+    raw_upper = raw_text.upper()
+    if any(title in raw_upper for title in _SECTION_TITLES):
+        parser = AdCopyParser()
+        for line in raw_text.splitlines():
+            parser.feed(line)
+        parser.close()
+        sections = tuple((title, parser.section(title)) for title in parser.sections)
+        if any(section_has_content(content) for _, content in sections):
+            return sections
+
+    # Without any section content the whole response is kept as raw intro text, so it is still shown
+    intro = raw_text.strip()
+    return (("Intro", intro),) if intro else ()
@@ -0,0 +1,182 @@
+"""
+Prompt templates for the marketing brief and ad copy Gemini calls.
+
+The templates are loaded into module constants once per server process rather than on every Streamlit rerun
+(the two large static scaffolds from templates/*.tmpl); each request only fills in its placeholders with str.format.
+"""
+
+import functools
+import hashlib
+from pathlib import Path
+
+# The two large static prompts are kept as plain-text files next to this module
+_TEMPLATE_DIR = Path(__file__).parent / "templates"
+
+def _load_template(name):
+    """Reads a prompt template from the templates directory."""
+    return (_TEMPLATE_DIR / name).read_text(encoding="utf-8")
+
+# --- MARKETING BRIEF ---
+
+# Static instructions of the marketing brief prompt (Highly verbose to ensure model adheres to constraints).
+# They never mention the URL or the focus services, so the rendered text is identical for every request in the
+# same search mode and can be registered once with Gemini's context cache.
+_BRIEF_SCAFFOLD_TEMPLATE = _load_template("brief_scaffold.tmpl")
+
+# Per-request part of the marketing brief prompt, sent after the static scaffold
+_BRIEF_REQUEST_TEMPLATE = """
+Target website: {url}
+{user_focus_note}
+{specific_services_prompt_section}"""
+
+_USER_FOCUS_NOTE_TEMPLATE = """
+IMPORTANT USER FOCUS: The user has specifically requested to focus on the following products/services: "{focus_services}". Please ensure your analysis, especially for "Specific Services/Product Lines to Feature", prioritizes these. For other sections, consider how these focused services might influence the overall strategy.
+"""
+
+_USER_SERVICE_LINE_TEMPLATE = (
+    "Service/Product {service_counter} (User Specified: {service}): "
+    "[Analyze {url} ({search_instruction}) to confirm and describe \"{service}\". "
+    "If not found or detailed {search_source}, state 'User-specified service \"{service}\" could not be verified/detailed {search_source}'. "
+    "Provide concise description from website content if found.]\n"
+)
+
+# Specific Services Section (Highly verbose to ensure model adheres to constraints)
+_USER_SERVICES_SECTION_TEMPLATE = """
+Specific Services/Product Lines to Feature:
+The user has expressed a specific interest in the following products/services from the website:
+{focus_services}
+
+Your task for this section:
+1.  For each "User Specified" service line below, analyze the website at {url} ({search_instruction}) to gather details about it.
+2.  Fill in the description for each. If a user-specified service cannot be clearly identified or detailed based on the content of {url} ({verification_basis}), explicitly state that in its description field (e.g., 'User-specified service "XYZ" could not be verified or detailed based on {url}'s content {search_source}').
+3.  After addressing all user-specified services, if there are other prominent and distinct services/product lines clearly featured on {url} that were not mentioned by the user, you MAY list and describe up to 2-3 *additional* distinct services/products, continuing the "Service/Product [number]: [description]" format (e.g., Service/Product {service_counter}: [description]).
+
+{service_list_for_prompt}
+(If applicable, continue with additional services found on {url} by you, ensuring you continue the numbering, e.g.:
+Service/Product {service_counter}: [Concise description of an additional service found {search_source}]
+Service/Product {next_service_counter}: [Concise description of another additional service found {search_source}]
+)
+"""
+
+_DEFAULT_SERVICES_SECTION_TEMPLATE = """
+Specific Services/Product Lines to Feature:
+(To determine this, {search_method} to identify its key specific services or product lines. List all clearly identifiable and distinct services/products with concise descriptions based *solely* on the website's content/search findings.)
+Service/Product 1: [Concise description of Service/Product 1 identified {search_source}, or 'Could not determine specific service 1 {search_source}.']
+Service/Product 2: [Concise description of Service/Product 2 identified {search_source}, or 'Could not determine specific service 2 {search_source}.']
+(Continue listing Service/Product 3, Service/Product 4, etc., if clearly identifiable and distinct {search_source})
+"""
+
+# Search-mode dependent phrases of the per-request prompt, chosen once per call; %s is filled with the URL
+_SEARCH_PHRASES = {
+    True: {
+        "search_method": "analyze the content found directly on the website %s",
+        "search_source": "from the website %s",
+        "search_instruction": "by reviewing its content directly",
+        "verification_basis": "when analyzing its content directly",
+    },
+    False: {
+        "search_method": "use your Google Search tool to find information about the website %s",
+        "search_source": "via Google Search for %s",
+        "search_instruction": "using Google Search if needed to find relevant pages *within* that site or directly related official information",
+        "verification_basis": "even with Google Search",
+    },
+}
+
+# Deletes square brackets from user-specified services so they cannot break the prompt's [placeholder] syntax
+_BRACKET_STRIP = str.maketrans('', '', '[]')
+
+def _render_brief_scaffold(website_only):
+    """Renders the static marketing brief instructions for one search mode."""
+    return _BRIEF_SCAFFOLD_TEMPLATE.format(
+        analysis_basis='content' if website_only else 'using Google Search',
+        search_method="analyze the content found directly on the target website" if website_only else "use your Google Search tool to find information about the target website",
+        search_source="from the target website" if website_only else "via Google Search for the target website",
+        competitive_landscape_fallback=(
+            "Competitive landscape cannot be determined from website content alone for the target website" if website_only
+            else "Could not determine competitive landscape via Google Search for the target website."
+        ),
+    )
+
+# Both search modes are rendered once at import; the scaffold never changes between requests
+_BRIEF_SCAFFOLDS = {website_only: _render_brief_scaffold(website_only) for website_only in (True, False)}
+
+def build_brief_scaffold(website_only):
+    """Returns the static instructions of the marketing brief prompt for the given search mode."""
+    return _BRIEF_SCAFFOLDS[website_only]
+
+# Resubmitting the same inputs (e.g. Regenerate) reuses the assembled prompt; the arguments are all hashable scalars
+@functools.lru_cache(maxsize=32)
+def build_marketing_brief_prompt(url, focus_services, website_only):
+    """Builds the per-request part of the marketing brief prompt, sent after the static scaffold."""
+    # Every template below is filled from this one context; each ignores the keys it does not use
+    phrases = _SEARCH_PHRASES[website_only]
+    ctx = {
+        "url": url,
+        "focus_services": focus_services,
+        "search_method": phrases["search_method"] % url,
+        "search_source": phrases["search_source"] % url,
+        "search_instruction": phrases["search_instruction"],
+        "verification_basis": phrases["verification_basis"],
+    }
+
+    user_services_array = [s.strip() for s in focus_services.splitlines() if s.strip()]
+
+    if user_services_array:
+        service_lines = [
+            _USER_SERVICE_LINE_TEMPLATE.format(
+                service_counter=service_counter,
+                service=userService.translate(_BRACKET_STRIP),
+                **ctx,
+            )
+            for service_counter, userService in enumerate(user_services_array, 1)
+        ]
+        # Numbering for any additional services the model adds continues after the user's
+        service_counter = len(user_services_array) + 1
+        ctx.update(
+            service_list_for_prompt=''.join(service_lines),
+            service_counter=service_counter,
+            next_service_counter=service_counter + 1,
+        )
+
+        ctx["specific_services_prompt_section"] = _USER_SERVICES_SECTION_TEMPLATE.format_map(ctx)
+        ctx["user_focus_note"] = _USER_FOCUS_NOTE_TEMPLATE.format_map(ctx)
+    else:
+        ctx["specific_services_prompt_section"] = _DEFAULT_SERVICES_SECTION_TEMPLATE.format_map(ctx)
+        ctx["user_focus_note"] = ""
+
+    return _BRIEF_REQUEST_TEMPLATE.format_map(ctx)
+
+# --- AD COPY ---
+
+# SIMPLIFIED AD COPY INSTRUCTIONS (static, so they can be registered once with Gemini's context cache)
+AD_COPY_SCAFFOLD = _load_template("ad_copy_scaffold.tmpl")
+
+_AD_COPY_REQUEST_TEMPLATE = """
+MARKETING BRIEF:
+---
+{internal_marketing_brief}
+---
+"""
+
+def build_ad_copy_prompt(internal_marketing_brief):
+    """Builds the per-request part of the ad copy prompt, sent after AD_COPY_SCAFFOLD."""
+    return _AD_COPY_REQUEST_TEMPLATE.format(internal_marketing_brief=internal_marketing_brief)
+
+# --- VERSION ---
+
+# Fingerprint of every prompt text above. Response caches take it as an argument, so editing a template
+# invalidates responses generated from the old prompts instead of serving them until they expire.
+PROMPTS_VERSION = hashlib.blake2b(
+    "\0".join((
+        *_BRIEF_SCAFFOLDS.values(),
+        _BRIEF_REQUEST_TEMPLATE,
+        _USER_FOCUS_NOTE_TEMPLATE,
+        _USER_SERVICE_LINE_TEMPLATE,
+        _USER_SERVICES_SECTION_TEMPLATE,
+        _DEFAULT_SERVICES_SECTION_TEMPLATE,
+        repr(_SEARCH_PHRASES),
+        AD_COPY_SCAFFOLD,
+        _AD_COPY_REQUEST_TEMPLATE,
+    )).encode(),
+    digest_size=8,
+).hexdigest()
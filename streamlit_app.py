@@ -1,9 +1,20 @@
 import streamlit as st
 import os
-import re
-from google import genai
-from google.genai.errors import APIError
-from urllib.parse import urlparse # Used for URL validation
+import copy
+import hashlib
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
+from itertools import zip_longest
+from pathlib import Path
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from ad_copy_parser import AdCopyParser, parse_ad_copy_text, section_has_content
+from prompts import AD_COPY_SCAFFOLD, PROMPTS_VERSION, build_ad_copy_prompt, build_brief_scaffold, build_marketing_brief_prompt
 
 # --- 1. CONFIGURATION AND INITIAL SETUP ---
 
@@ -18,12 +29,23 @@ if not API_KEY:
     st.error("🚨 **API Key Missing!** Please set the `GEMINI_API_KEY` in your Streamlit secrets or environment variables.")
     st.stop()
 
-# Initialize the Gemini Client
-try:
-    ai = genai.Client(api_key=API_KEY)
-except Exception as e:
-    st.error(f"Failed to initialize Gemini Client: {e}")
-    st.stop()
+GEMINI_MODEL = "gemini-2.5-flash"
+# Generated briefs and ad copy are shared by all sessions and reused for up to a day.
+# Each response cache also keeps at most this many entries, in memory and on disk.
+RESPONSE_CACHE_TTL = 24 * 60 * 60
+RESPONSE_CACHE_MAX_ENTRIES = 1024
+# Responses are also written here, one file per prompt hash, so they survive server restarts
+RESPONSE_CACHE_DIR = Path(__file__).parent / ".response_cache"
+# Longest URL accepted from the form; longer input is treated as invalid
+MAX_URL_LENGTH = 2048
+
+# Initialize the Gemini Client once per server process so its HTTP connection pool survives reruns.
+# The SDK is imported on first use, so the page renders without waiting for its (heavy) import.
+@st.cache_resource(show_spinner=False)
+def get_genai_client(api_key: str):
+    """Returns the shared Gemini client for the given API key."""
+    from google import genai
+    return genai.Client(api_key=api_key)
 
 # Set Streamlit Page Configuration
 st.set_page_config(
@@ -33,281 +55,446 @@ st.set_page_config(
 
 # --- 2. HELPER FUNCTIONS ---
 
-def parse_ad_copy_text(raw_text: str):
+_AD_COPY_TABLE_HEAD = (
+    '<table class="ad-copy-table"><thead><tr>'
+    '<th>Headlines (Max 30 Chars)</th><th>Descriptions (Max 90 Chars)</th>'
+    '</tr></thead><tbody>'
+)
+
+def format_ad_copy_table(headlines: list, descriptions: list):
     """
-    Parses the raw text response from the Gemini model into a structured dictionary.
+    Formats Headlines and Descriptions into a static HTML table.
+    The table is small, so plain HTML is much cheaper to render than an Arrow-serialized st.dataframe grid.
     """
-    output = {}
-    
-    # Use a flexible regex to split by all major section titles
-    sections = re.split(r'(AD COPY VARIATION \d+.*?):|SITELINKS:|STRUCTURED SNIPPETS:|CALLOUTS:', raw_text, flags=re.IGNORECASE)
-    
-    # Process sections, skipping the first element which is usually pre-text
-    current_title = "Intro"
-    for i in range(len(sections)):
-        section_part = sections[i].strip()
-        
-        if not section_part:
-            continue
-            
-        # Check if this part is a title (ends with colon or is a known major title)
-        if section_part.upper().startswith(("AD COPY VARIATION", "SITELINKS", "STRUCTURED SNIPPETS", "CALLOUTS")):
-            current_title = section_part.strip(':').strip()
-            output[current_title] = ""
-        elif current_title in output and output[current_title] == "":
-            # Append content to the current title, ensuring not to overwrite
-            output[current_title] = section_part
-        elif i == 0:
-             # Handle possible intro text before the first formal section
-             output["Intro"] = section_part
-            
-    return output
-
-def format_ad_copy_table(content: str):
-    """Formats Headlines and Descriptions into a Streamlit table."""
-    headlines_match = re.search(r'Headlines:\s*([\s\S]*?)(Descriptions:|$)', content, re.IGNORECASE)
-    descriptions_match = re.search(r'Descriptions:\s*([\s\S]*)', content, re.IGNORECASE)
-    
-    headlines = []
-    descriptions = []
-
-    if headlines_match and headlines_match.group(1):
-        # Using re.sub() for regex replacement to remove the '- ' prefix
-        headlines = [re.sub(r'^- ', '', h.strip()) for h in headlines_match.group(1).split('\n') if h.strip().startswith('- ')]
-    
-    if descriptions_match and descriptions_match.group(1):
-        # Using re.sub() for regex replacement to remove the '- ' prefix
-        descriptions = [re.sub(r'^- ', '', d.strip()) for d in descriptions_match.group(1).split('\n') if d.strip().startswith('- ')]
-        
-    max_rows = max(len(headlines), len(descriptions))
-    data = []
-    for i in range(max_rows):
-        data.append({
-            "Headlines (Max 30 Chars)": headlines[i] if i < len(headlines) else '–',
-            "Descriptions (Max 90 Chars)": descriptions[i] if i < len(descriptions) else '–'
-        })
-        
-    if data:
-        st.dataframe(data, use_container_width=True, hide_index=True)
-    else:
+    if not headlines and not descriptions:
         st.write("No headlines or descriptions found for this variation.")
+        return
 
-def format_structured_snippets(content: str):
-    """Formats Structured Snippets (Header: Value lists)."""
-    snippet_blocks = re.split(r'\bHeader:', content, flags=re.IGNORECASE)
-    for block in snippet_blocks:
-        block = block.strip()
-        if not block:
-            continue
-            
-        lines = [l.strip() for l in block.split('\n')]
-        if lines:
-            header_text = lines[0].strip(':').strip()
-            # Filter and clean values starting with '- '
-            values = [v.replace('- ', '').strip() for v in lines[1:] if v.startswith('- ')]
-            
-            if header_text and values:
+    # The shorter column is padded with '–' as the rows are paired up
+    rows = ''.join(
+        f"<tr><td>{escape(h)}</td><td>{escape(d)}</td></tr>"
+        for h, d in zip_longest(headlines, descriptions, fillvalue='–')
+    )
+
+    st.markdown(f"{_AD_COPY_TABLE_HEAD}{rows}</tbody></table>", unsafe_allow_html=True)
+
+def format_structured_snippets(snippets: list):
+    """Formats Structured Snippets given as (header, values, lines) triples."""
+    for header_text, values, lines in snippets:
+        if values or lines:
+            if header_text:
                 st.markdown(f"**{header_text}**")
+            if values:
                 st.markdown('\n'.join(f'* {v}' for v in values))
-            elif block:
-                st.code(block, language='text')
-
-# --- 3. UI DISPLAY ---
+            else:
+                # Values the parser could not split into '- ' items (e.g. "Values: X, Y, Z") are shown as written
+                st.code('\n'.join(lines), language='text')
+        elif header_text:
+            st.code(header_text, language='text')
+
+def display_ad_copy_section(title: str, content):
+    """Renders one parsed ad copy section under its title."""
+    if not content:
+        return
 
-# Inject basic CSS styles for a cleaner look
-st.markdown(
+    st.markdown(f"### {title}")
+
+    # Only the title's prefix decides how it is displayed
+    title_upper = title[:24].upper()
+    if title_upper.startswith("AD COPY VARIATION"):
+        format_ad_copy_table(content["headlines"], content["descriptions"])
+    elif title_upper.startswith("STRUCTURED SNIPPETS"):
+        format_structured_snippets(content)
+    else: # Sitelinks, Callouts and unstructured intro text
+        # Display raw text for these sections as they are already structured lists
+        show_read_only_text(st, title, content)
+
+def show_read_only_text(target, label: str, text: str):
+    """Shows text in a disabled text area on target, which skips the syntax highlighting pass of st.code."""
+    # About one line per 24px, within Streamlit's 68px minimum and capped for long texts
+    height = min(400, max(68, 24 * (text.count('\n') + 2)))
+    target.text_area(label, text, height=height, disabled=True, label_visibility='collapsed')
+
+def start_response_stream(fetch, *args, **kwargs):
     """
-    <style>
-    .main .block-container {
-        padding-top: 2rem;
-        padding-bottom: 2rem;
-        max-width: 960px;
-        margin: 20px auto;
-        padding: 25px 35px;
-        background-color: #FFFFFF;
-        border-radius: 12px;
-        box-shadow: 0 8px 25px rgba(0, 0, 0, 0.075);
-    }
-    .header-p {
-        font-size: 1.05em;
-        color: #6C757D;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
-
-st.title("AI-Powered Marketing Brief & Ads Generator")
-st.markdown('<p class="header-p">Enter a website URL to generate a comprehensive marketing brief. Then, generate Google Ads copy based on that brief.</p>', unsafe_allow_html=True)
-
-st.markdown("---") # Visual separator
-
-# --- 4. INPUT FORM ---
-
-with st.form(key='marketing_form'):
-    url = st.text_input(
-        "Website URL:",
-        placeholder="https://example.com",
-        help="Please include http:// or https://"
-    )
-
-    focus_services = st.text_area(
-        "Specific Products/Services to Focus On (Optional, one per line):",
-        placeholder="e.g., Eco-friendly Gadgets\nAI-Powered Analytics\nSustainable Fashion",
-        height=150
-    )
+    Runs a cached Gemini fetch on a worker thread and returns its future and a queue of text chunks.
+    The queue receives each chunk as it streams in, followed by None once the fetch has finished.
+    """
+    chunks = queue.SimpleQueue()
+    # Streamlit's caches only read and write entries on threads that carry the session's script run context
+    ctx = get_script_run_ctx()
+
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        try:
+            return fetch(*args, _on_chunk=chunks.put, **kwargs)
+        finally:
+            chunks.put(None)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(run)
+    executor.shutdown(wait=False)
+    return future, chunks
+
+def render_response_stream(future, chunks, placeholder, label: str) -> str:
+    """
+    Streams chunks into the placeholder with st.write_stream as they arrive, then shows the full response text
+    in a read-only text area labelled `label` and returns it.
+    """
+    placeholder.write_stream(iter(chunks.get, None))
 
-    website_only = st.checkbox(
-        "Strictly analyze website content only (disable external search for brief generation)",
-        value=False
-    )
+    # Cache hits stream nothing, so always render the final text
+    response_text = future.result()
+    if response_text:
+        show_read_only_text(placeholder, label, response_text)
+    return response_text
 
-    generate_button = st.form_submit_button("Generate Ad Assets")
+def render_ad_copy_stream(future, chunks, container, placeholder) -> tuple:
+    """
+    Parses the streamed ad copy line by line and formats each section into its own slot in the container
+    as soon as the next section title arrives. Text that is not formatted yet is shown raw in the placeholder.
+    Returns the full response text and the parsed sections.
+    """
+    parser = AdCopyParser()
+    slots = {}
+    rendered = {}  # content last shown in each slot
+
+    def show(title):
+        # A repeated title re-renders its existing slot with the merged content. Unchanged content is skipped,
+        # since re-creating an identical text area in the same run would be a duplicate widget.
+        content = parser.section(title)
+        if title not in slots:
+            slots[title] = container.empty()
+        elif content == rendered[title]:
+            return
+        rendered[title] = copy.deepcopy(content)
+        with slots[title].container():
+            display_ad_copy_section(title, content)
+
+    buffer = ""
+    last_end = 0  # offset just past the last complete line fed to the parser
+    raw_start = 0  # offset of the first line not yet formatted into a section
+
+    def consume(start, end):
+        nonlocal raw_start
+        for line in buffer[start:end].splitlines(keepends=True):
+            closed_title = parser.feed(line)
+            if closed_title:
+                show(closed_title)
+                raw_start = start
+            start += len(line)
+
+    for text in iter(chunks.get, None):
+        buffer += text
+        line_end = buffer.rfind('\n') + 1
+        if line_end > last_end:
+            consume(last_end, line_end)
+            last_end = line_end
+        placeholder.code(buffer[raw_start:], language='text')
+
+    response_text = future.result()
+    sections = {}
+    if buffer:
+        # Feed the unterminated last line and flush the section still open
+        consume(last_end, len(buffer))
+        last_title = parser.close()
+        if last_title:
+            show(last_title)
+        sections = {title: parser.section(title) for title in parser.sections}
+    if not any(section_has_content(content) for content in sections.values()):
+        # Cache hits stream nothing, and a response without section content is shown as raw text;
+        # both come from the parse cache and are rendered in one go, replacing any empty sections shown so far
+        for slot in slots.values():
+            slot.empty()
+        sections = dict(parse_ad_copy_text(response_text))
+        with container:
+            for title, content in sections.items():
+                display_ad_copy_section(title, content)
+    placeholder.empty()
+    return response_text, sections
 
-# --- 5. CORE GENERATION LOGIC ---
+# --- 3. UI DISPLAY ---
 
-def generate_assets(url, focus_services, website_only):
-    """Handles the two-step Gemini API calls."""
-    
-    # 1. URL Validation
-    try:
-        # Prepend https:// if no scheme is provided, for robust parsing
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-        urlparse(url) # This will raise an error for truly invalid URLs
-    except ValueError:
-        st.error("❌ **Invalid URL:** The entered URL is not valid. Please ensure it includes http:// or https:// and is correctly formatted.")
-        return
+# Basic CSS styles for a cleaner look, kept unindented so leading whitespace does not pad the payload.
+# The block still has to be emitted on every run: Streamlit drops elements a rerun does not re-emit.
+_CSS = """<style>
+.main .block-container {
+padding-top: 2rem;
+padding-bottom: 2rem;
+max-width: 960px;
+margin: 20px auto;
+padding: 25px 35px;
+background-color: #FFFFFF;
+border-radius: 12px;
+box-shadow: 0 8px 25px rgba(0, 0, 0, 0.075);
+}
+.header-p {
+font-size: 1.05em;
+color: #6C757D;
+}
+.ad-copy-table {
+width: 100%;
+}
+</style>"""
+
+# The other static HTML blocks emitted on every run
+_HEADER_HTML = '<p class="header-p">Enter a website URL to generate a comprehensive marketing brief. Then, generate Google Ads copy based on that brief.</p>'
+_FOOTER_HTML = "<footer><p style='text-align:center; color:#6C757D;'>Powered by Gemini API</p></footer>"
+
+st.markdown(_CSS, unsafe_allow_html=True)
 
-    # 2. Setup Prompts and Configuration
-    
-    search_method = f"analyze the content found directly on the website {url}" if website_only else f"use your Google Search tool to find information about the website {url}"
-    search_source = f"from the website {url}" if website_only else f"via Google Search for {url}"
-    not_found_message_template = f"Could not determine {{section_name}} {search_source}."
-
-    # Logic for Specific Services Section (Highly verbose to ensure model adheres to constraints)
-    specific_services_prompt_section = ""
-    if focus_services:
-        user_services_array = [s.strip() for s in focus_services.split('\n') if s.strip()]
-        service_list_for_prompt = ''
-        service_counter = 1
-        
-        for userService in user_services_array:
-            safe_userService = userService.replace('[', '').replace(']', '')
-            search_instruction = "by reviewing its content directly" if website_only else "using Google Search if needed to find relevant pages *within* that site or directly related official information"
-            service_list_for_prompt += (
-                f"Service/Product {service_counter} (User Specified: {safe_userService}): "
-                f"[Analyze {url} ({search_instruction}) to confirm and describe \"{safe_userService}\". "
-                f"If not found or detailed {search_source}, state 'User-specified service \"{safe_userService}\" could not be verified/detailed {search_source}'. "
-                f"Provide concise description from website content if found.]\n"
-            )
-            service_counter += 1
-            
-        specific_services_prompt_section = f"""
-Specific Services/Product Lines to Feature:
-The user has expressed a specific interest in the following products/services from the website:
-{focus_services}
-
-Your task for this section:
-1.  For each "User Specified" service line below, analyze the website at {url} ({search_instruction}) to gather details about it.
-2.  Fill in the description for each. If a user-specified service cannot be clearly identified or detailed based on the content of {url} ({'when analyzing its content directly' if website_only else 'even with Google Search'}), explicitly state that in its description field (e.g., 'User-specified service "XYZ" could not be verified or detailed based on {url}\'s content {search_source}').
-3.  After addressing all user-specified services, if there are other prominent and distinct services/product lines clearly featured on {url} that were not mentioned by the user, you MAY list and describe up to 2-3 *additional* distinct services/products, continuing the "Service/Product [number]: [description]" format (e.g., Service/Product {service_counter}: [description]).
-
-{service_list_for_prompt}
-(If applicable, continue with additional services found on {url} by you, ensuring you continue the numbering, e.g.:
-Service/Product {service_counter}: [Concise description of an additional service found {search_source}]
-Service/Product {service_counter + 1}: [Concise description of another additional service found {search_source}]
-)
-"""
-    else:
-        specific_services_prompt_section = f"""
-Specific Services/Product Lines to Feature:
-(To determine this, {search_method} to identify its key specific services or product lines. List all clearly identifiable and distinct services/products with concise descriptions based *solely* on the website's content/search findings.)
-Service/Product 1: [Concise description of Service/Product 1 identified {search_source}, or '{not_found_message_template.replace("{{section_name}}", "specific service 1")}']
-Service/Product 2: [Concise description of Service/Product 2 identified {search_source}, or '{not_found_message_template.replace("{{section_name}}", "specific service 2")}']
-(Continue listing Service/Product 3, Service/Product 4, etc., if clearly identifiable and distinct {search_source})
-"""
-    
-    # Full Marketing Brief Prompt (Highly verbose to ensure model adheres to constraints)
-    marketing_brief_prompt = f"""
-IMPORTANT: You MUST generate the complete marketing brief structure as outlined below. For every section, provide the requested information based on your analysis of the website {url} {'content' if website_only else 'using Google Search'}. If, after attempting to {search_method}, you cannot find specific information for a section, you MUST explicitly write a '{not_found_message_template.replace("{{section_name}}", "[section name]")}' message (e.g., '{not_found_message_template.replace("{{section_name}}", "Business Name")}') within that section. DO NOT return an empty response or omit sections. The entire structure must be present in your output. Any sections for which information cannot be found MUST contain the appropriate 'Could not determine...' phrase.
+st.title("AI-Powered Marketing Brief & Ads Generator")
+st.markdown(_HEADER_HTML, unsafe_allow_html=True)
 
-You are an expert marketing strategist. Your mission is to analyze the website at the URL "{url}" and generate a comprehensive Marketing Brief. For each section below, you will {search_method} to find the relevant information. If information for a section cannot be found after a reasonable attempt, explicitly state '{not_found_message_template.replace("{{section_name}}", "[Relevant Section Name]")}'. Address ALL sections.
-{f'\\nIMPORTANT USER FOCUS: The user has specifically requested to focus on the following products/services: "{focus_services}". Please ensure your analysis, especially for "Specific Services/Product Lines to Feature", prioritizes these. For other sections, consider how these focused services might influence the overall strategy.\\n' if focus_services else ''}
-Marketing Brief for Website: {url}
+st.markdown("---") # Visual separator
 
-Business Name:
-(To determine this, {search_method}. Based on your findings, state the business name. If not clearly identifiable, state '{not_found_message_template.replace("{{section_name}}", "Business Name")}')
+# --- 4. INPUT FORM ---
 
-Campaign Goal:
-(To determine this, {search_method}. Explain your choice briefly based on your findings. If unclear, state '{not_found_message_template.replace("{{section_name}}", "primary campaign goal")}')
+def render_input_form():
+    """Renders the input form and returns (url, focus_services, website_only, generate_button)."""
+    with st.form(key='marketing_form'):
+        url = st.text_input(
+            "Website URL:",
+            placeholder="https://example.com",
+            help="Please include http:// or https://"
+        )
 
-Overall Product/Service Category:
-(To determine this, {search_method}. Describe the category. If unclear, state '{not_found_message_template.replace("{{section_name}}", "overall product/service category")}')
+        focus_services = st.text_area(
+            "Specific Products/Services to Focus On (Optional, one per line):",
+            placeholder="e.g., Eco-friendly Gadgets\nAI-Powered Analytics\nSustainable Fashion",
+            height=150
+        )
 
-{specific_services_prompt_section}
+        website_only = st.checkbox(
+            "Strictly analyze website content only (disable external search for brief generation)",
+            value=False
+        )
 
-Target Geographic Location(s):
-(To determine this, {search_method}. Describe based on your findings. If not determinable or if the service is global/national without specific local focus, state '{not_found_message_template.replace("{{section_name}}", "specific target geographic locations")}, or service appears to be national/global'.)
+        generate_button = st.form_submit_button("Generate Ad Assets")
 
-Target Audience Profile(s):
-(To determine this, {search_method}. Describe one primary persona. If multiple distinct personas are clearly evident from your findings for {url}, describe a second one.)
-Persona 1 Name (e.g., "Tech-Savvy Startup Founder"): [Describe Demographics, Psychographics, Needs, Pain Points, What they value most, as inferred {search_source}. If not determinable, state '{not_found_message_template.replace("{{section_name}}", "Persona 1 details")}'.]
-(Persona 2 Name (e.g., "Established Enterprise CTO"): [Describe Demographics, Psychographics, Needs, Pain Points, What they value most, as inferred {search_source} if a second distinct persona is evident. Otherwise, omit or state 'Second distinct persona not clearly identifiable {search_source}'.])
+    return url, focus_services, website_only, generate_button
 
-Primary Keywords (High Intent):
-(To determine this, {search_method}. List these keywords based on your findings for {url}. If not determinable, state '{not_found_message_template.replace("{{section_name}}", "primary keywords")}')
-- [Keyword 1 identified {search_source}]
-- [Keyword 2 identified {search_source}]
-- ...
+# --- 5. CORE GENERATION LOGIC ---
 
-Unique Selling Propositions (USPs) / Core Differentiators:
-(To determine this, {search_method}. List 1-3 USPs based on your findings for {url}. If not determinable, state '{not_found_message_template.replace("{{section_name}}", "USPs")}')
-- [USP 1 identified {search_source}]
-- ...
+# Gemini only caches contents of at least 1024 tokens for this model; at roughly 4 characters per token, shorter
+# scaffolds are sent inline without attempting a create call that would be rejected
+MIN_CACHED_SCAFFOLD_CHARS = 4 * 1024
 
-Competitive Landscape (Optional but Recommended):
-(To determine this, {search_method}. Briefly mention 1-2 competitors and a key differentiator for {url} based on your findings. If not determinable, state '{'Competitive landscape cannot be determined from website content alone for ' + url if website_only else not_found_message_template.replace("{{section_name}}", "competitive landscape")}'.)
+# Gemini keeps explicit context caches for an hour; the handle is dropped a little earlier so it is never used after expiry.
+@st.cache_resource(ttl=3000, show_spinner=False)
+def _get_prompt_cache(_client, scaffold: str, use_search: bool):
+    """
+    Registers a static prompt scaffold with Gemini's context cache and returns the cache name.
+    Returns None when the cache cannot be created (e.g. the scaffold is below the model's minimum cacheable size),
+    in which case the scaffold is sent inline with each request.
+    """
+    if len(scaffold) < MIN_CACHED_SCAFFOLD_CHARS:
+        return None
+
+    cache_config = {"contents": [scaffold], "ttl": "3600s"}
+    if use_search:
+        # Tools cannot be passed alongside cached content, so they have to live in the cache itself
+        cache_config["tools"] = [{"googleSearch": {}}]
+    from google.genai.errors import APIError
+    try:
+        return _client.caches.create(model=GEMINI_MODEL, config=cache_config).name
+    except APIError:
+        return None
+
+def build_generate_config(client, scaffold: str, request_prompt: str, use_search: bool) -> dict:
+    """Builds generate_content arguments that reference the cached scaffold, or inline it if it is not cached."""
+    cache_name = _get_prompt_cache(client, scaffold, use_search)
+    if cache_name:
+        return {"model": GEMINI_MODEL, "contents": request_prompt, "config": {"cached_content": cache_name}}
+
+    generate_config = {"model": GEMINI_MODEL, "contents": scaffold + request_prompt}
+    if use_search:
+        generate_config["config"] = {"tools": [{"googleSearch": {}}]}
+    return generate_config
+
+def _collect_stream(client, config: dict, on_chunk=None) -> str:
+    """Streams a Gemini response, forwarding each text chunk to on_chunk, and returns the full text."""
+    parts = []
+    for chunk in client.models.generate_content_stream(**config):
+        if chunk.text:
+            parts.append(chunk.text)
+            if on_chunk:
+                on_chunk(chunk.text)
+        # Stop at the finish reason rather than waiting for the stream to close
+        if chunk.candidates and chunk.candidates[0].finish_reason:
+            break
+    return "".join(parts)
+
+class ResponseStore:
+    """
+    Gemini responses keyed by prompt hash, kept in memory and written through to one file per response in
+    `directory`, whose modification time records when it was generated. Entries expire after RESPONSE_CACHE_TTL
+    and the oldest are evicted, in memory and on disk, beyond RESPONSE_CACHE_MAX_ENTRIES.
+    Shared by every session, so all access goes through a lock.
+    """
 
-Desired Call-to-Action (CTA):
-(To determine this, {search_method}. State the main CTA based on your findings for {url}. If multiple, choose the most prominent. If not determinable, state '{not_found_message_template.replace("{{section_name}}", "primary CTA")}')
+    def __init__(self, directory: Path):
+        self._entries = OrderedDict()  # key -> (created_at, text), oldest first
+        self._lock = threading.Lock()
+        self._directory = directory
+
+    def get(self, key: str):
+        """Returns the stored text for key, or None if there is none or it has expired."""
+        with self._lock:
+            entry = self._entries.get(key) or self._load(key)
+        if entry and time.time() - entry[0] < RESPONSE_CACHE_TTL:
+            return entry[1]
+        return None
+
+    def put(self, key: str, text: str):
+        """Stores text under key, replacing any earlier entry, and evicts the oldest entries beyond the limit."""
+        with self._lock:
+            self._remember(key, (time.time(), text))
+            path = self._directory / f"{key}.txt"
+            try:
+                self._directory.mkdir(parents=True, exist_ok=True)
+                # Written to a temporary file first, so a concurrent reader never sees a partial response
+                temp_path = path.with_suffix(".tmp")
+                temp_path.write_text(text, encoding="utf-8")
+                os.replace(temp_path, path)
+                self._evict_files()
+            except OSError:
+                pass  # Persisting is best effort; the response is still kept in memory
+
+    def _remember(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > RESPONSE_CACHE_MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str):
+        """Reads a response persisted by an earlier server process into memory and returns its entry, if any."""
+        path = self._directory / f"{key}.txt"
+        try:
+            entry = (path.stat().st_mtime, path.read_text(encoding="utf-8"))
+        except OSError:
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def _evict_files(self):
+        """Deletes expired response files and the oldest ones beyond the entry limit."""
+        files = sorted(((path.stat().st_mtime, path) for path in self._directory.glob("*.txt")), reverse=True)
+        expires_before = time.time() - RESPONSE_CACHE_TTL
+        for i, (created_at, path) in enumerate(files):
+            if i >= RESPONSE_CACHE_MAX_ENTRIES or created_at < expires_before:
+                path.unlink(missing_ok=True)
+
+# Responses are also stored by the content of their prompt, so inputs that render the same prompt
+# (e.g. focus services differing only in spacing) share one response, across users and server restarts.
+# The prompt hash covers the templates too, so persisted responses from edited prompts are never served.
+@st.cache_resource(show_spinner=False)
+def _get_response_store() -> ResponseStore:
+    """Returns the process-wide response store."""
+    return ResponseStore(RESPONSE_CACHE_DIR)
+
+def _prompt_key(scaffold: str, request_prompt: str, use_search: bool) -> str:
+    """Hashes the full prompt, normalized for trailing whitespace and repeated spaces, with the settings that affect the response."""
+    prompt = scaffold + request_prompt
+    normalized = '\n'.join(' '.join(line.split()) for line in prompt.splitlines())
+    key_source = f"{GEMINI_MODEL}\n{use_search}\n{normalized}"
+    return hashlib.blake2b(key_source.encode(), digest_size=16).hexdigest()
+
+class EmptyResponseError(Exception):
+    """Raised when Gemini returns no text, so that the empty result is never stored or cached."""
+
+def _generate(client, scaffold: str, request_prompt: str, use_search: bool, on_chunk=None, refresh: bool = False) -> str:
+    """
+    Returns the stored response for an identical prompt, or streams a new one from Gemini and stores it.
+    With `refresh`, the stored response is ignored and replaced.
+    """
+    store = _get_response_store()
+    key = _prompt_key(scaffold, request_prompt, use_search)
+    stored_text = None if refresh else store.get(key)
+    if stored_text:
+        return stored_text
+
+    response_text = _collect_stream(client, build_generate_config(client, scaffold, request_prompt, use_search), on_chunk)
+    if not response_text:
+        raise EmptyResponseError()
+
+    store.put(key, response_text)
+    return response_text
+
+# Responses are cached on the user's inputs so resubmitting the same form skips the API entirely. The cache is
+# shared by every session. `prompts_version` is part of the key so responses from edited prompts are not reused.
+# `_client`, `_on_chunk` and `_refresh` are left out of the cache key by their leading underscore; they only matter on a cache miss.
+@st.cache_data(ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES, show_spinner=False)
+def _generate_brief(url: str, focus_services: str, website_only: bool, prompts_version: str, _client, _on_chunk=None, _refresh=False) -> str:
+    """Generates the marketing brief for the given inputs."""
+    return _generate(
+        _client,
+        build_brief_scaffold(website_only),
+        build_marketing_brief_prompt(url, focus_services, website_only),
+        use_search=not website_only,
+        on_chunk=_on_chunk,
+        refresh=_refresh
+    )
 
-Brand Voice / Tone:
-(To determine this, {search_method} and describe: "What is the brand voice or tone of the website {url} (e.g., Authoritative & Innovative, Inspiring & Exclusive, Reliable & Empathetic)?". Justify briefly based on your findings. If not determinable, state '{not_found_message_template.replace("{{section_name}}", "brand voice/tone")}')
+@st.cache_data(ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES, show_spinner=False)
+def _generate_adcopy(brief: str, prompts_version: str, _client, _on_chunk=None, _refresh=False) -> str:
+    """Generates the raw Google Ads assets text for a marketing brief."""
+    return _generate(_client, AD_COPY_SCAFFOLD, build_ad_copy_prompt(brief), use_search=False, on_chunk=_on_chunk, refresh=_refresh)
 
-Any Current Promotions/Offers:
-(To determine this, {search_method}. If yes, describe them based on your findings. If no clear promotions are found on {url}, state 'No current promotions/offers found {search_source}'.)
+def generate_assets(url, focus_services, website_only, refresh=False):
+    """
+    Handles the two-step Gemini API calls.
+    With `refresh`, cached responses for these inputs are dropped and generated again; other inputs keep theirs.
+    Returns the marketing brief and the parsed ad copy sections, or None if generation failed.
+    """
+    
+    # 1. URL Normalization and Validation
+    # Prepend https:// if no scheme is provided
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+
+    # Require a host that looks like a domain name, and reject oversized input before it reaches the prompt
+    netloc = url.split('//', 1)[1].split('/', 1)[0]
+    if not netloc or '.' not in netloc or len(url) > MAX_URL_LENGTH:
+        st.error("❌ **Invalid URL:** The entered URL is not valid. Please ensure it includes http:// or https:// and is correctly formatted.")
+        return
 
-Implicit Negative Intents to Avoid:
-(To determine this, based on the understanding of {url} {search_source}, suggest: "What are 1-2 keyword intents or search terms that the website {url} should AVOID targeting (e.g., 'free' if it's a premium service)?". If not determinable, state '{not_found_message_template.replace("{{section_name}}", "implicit negative intents")}')
-"""
+    # Creating the client is also where the Gemini SDK gets imported, so import failures are reported here too.
+    # It is resolved here on the script thread and handed to the fetch workers.
+    try:
+        ai = get_genai_client(API_KEY)
+    except Exception as e:
+        st.error(f"Failed to initialize Gemini Client: {e}")
+        return
+    from google.genai.errors import APIError
 
-    # 3. First API Call: Generate Marketing Brief
+    # 2. First API Call: Generate Marketing Brief
     
     st.subheader("Marketing Brief Generation")
     brief_placeholder = st.empty()
     brief_placeholder.info("Step 1 of 2: Generating comprehensive Marketing Brief...")
+    brief_output = st.empty()
     
     try:
-        brief_config = {
-            "model": "gemini-2.5-flash",
-            "contents": marketing_brief_prompt,
-        }
-        if not website_only:
-            brief_config["config"] = {"tools": [{"googleSearch": {}}]}
-        
-        # Corrected to use snake_case generate_content
-        brief_response = ai.models.generate_content(**brief_config)
-        internal_marketing_brief = brief_response.text
-        
-        if not internal_marketing_brief:
-            brief_placeholder.error("The model returned an empty response for the marketing brief.")
-            return
-
-        brief_placeholder.empty()
-        st.markdown("### 📝 Generated Marketing Brief")
-        st.code(internal_marketing_brief, language='markdown')
-
+        # Stream the brief so the first tokens show up while the rest is still generating
+        if refresh:
+            _generate_brief.clear(url, focus_services, website_only, PROMPTS_VERSION)
+        brief_future, brief_chunks = start_response_stream(
+            _generate_brief, url, focus_services, website_only, PROMPTS_VERSION, _client=ai, _refresh=refresh
+        )
+        internal_marketing_brief = render_response_stream(brief_future, brief_chunks, brief_output, "Marketing Brief")
+
+        # Start the ad copy request before laying out the rest of the UI so it is already in flight
+        if refresh:
+            _generate_adcopy.clear(internal_marketing_brief, PROMPTS_VERSION)
+        adcopy_future, adcopy_chunks = start_response_stream(
+            _generate_adcopy, internal_marketing_brief, PROMPTS_VERSION, _client=ai, _refresh=refresh
+        )
+        brief_placeholder.markdown("### 📝 Generated Marketing Brief")
+
+    except EmptyResponseError:
+        brief_placeholder.error("The model returned an empty response for the marketing brief.")
+        return
     except APIError as e:
         brief_placeholder.error(f"❌ Gemini API Error (Brief Generation): {e.message}")
         return
@@ -317,96 +504,73 @@ Implicit Negative Intents to Avoid:
 
     st.markdown("---")
 
-    # 4. Second API Call: Generate Ad Copy Assets
-    
-    # SIMPLIFIED AD COPY PROMPT
-    ad_copy_prompt = f"""
-You are the world's unparalleled Google Ads copywriter and the pinnacle of prompt engineering.
-Your mission is to generate Google Ads assets based on the following Marketing Brief.
-
-MARKETING BRIEF:
----
-{internal_marketing_brief}
----
-
-INSTRUCTIONS (SIMPLIFIED TO REDUCE OUTPUT VOLUME):
-1.  **Ad Copy Variations:**
-    * Analyze the "Specific Services/Product Lines to Feature" section of the Marketing Brief. Count the number of distinct services listed (N) that have actual descriptions (not "Could not determine..." or "could not be verified/detailed"). These lines typically start with "Service/Product [number]".
-    * Generate exactly N distinct "AD COPY VARIATION" blocks. If N is 0 (no services with valid descriptions found), generate one (1) general ad copy variation.
-    * For each "AD COPY VARIATION [i]":
-        * Clearly state the service focus (e.g., "AD COPY VARIATION 1 (Service Focus: [Extracted Service Name from Brief])").
-        * **Headlines:** You MUST generate **EXACTLY 12 distinct headlines**. Each headline MUST BE **STRICTLY 30 characters or less**.
-        * **Descriptions:** You MUST generate **EXACTLY 4 distinct descriptions**. Each description MUST BE **STRICTLY 90 characters or less**.
-        * **Formatting:** You MUST include the labels "Headlines:" and "Descriptions:", and list items using the dash prefix (`- `).
-
-2.  **Sitelinks (3 variations):**
-    * Generate **EXACTLY 3 Sitelink variations**.
-    * Each Sitelink MUST adhere to the following STRICT character limits: Sitelink Text: **STRICTLY 25 characters or less**. Description Line 1: **STRICTLY 35 characters or less**. Description Line 2: **STRICTLY 35 characters or less**.
-    * Format: Use the multiline format shown in the previous prompt.
-
-3.  **Structured Snippets (2 distinct headers):**
-    * Choose 2 appropriate headers (e.g., Services, Types).
-    * For each header, list 3-5 relevant values. Each value MUST BE **STRICTLY 25 characters or less**.
-
-4.  **Callouts (3 variations):**
-    * Generate **EXACTLY 3 Callout variations**.
-    * Each callout MUST BE **STRICTLY 25 characters or less**.
-    * Format: List using the dash prefix (`- `).
-
-Output all sections clearly separated. Adhere STRICTLY to the new reduced character and quantity limits.
-"""
+    # 3. Second API Call: Generate Ad Copy Assets
 
     st.subheader("Ad Copy Generation")
     adcopy_placeholder = st.empty()
     adcopy_placeholder.info("Step 2 of 2: Generating Google Ads Assets...")
+    assets_container = st.container()
+    adcopy_output = st.empty()
 
     try:
-        adcopy_config = {
-            "model": "gemini-2.5-flash",
-            "contents": ad_copy_prompt,
-        }
-        
-        # Corrected to use snake_case generate_content
-        adcopy_response = ai.models.generate_content(**adcopy_config)
-        raw_ad_copy_text = adcopy_response.text
-
-        if not raw_ad_copy_text:
-            adcopy_placeholder.error("The model returned an empty response for ad copies.")
-            return
+        # Each section is formatted as soon as the next one starts, so display overlaps generation
+        raw_ad_copy_text, parsed_output = render_ad_copy_stream(adcopy_future, adcopy_chunks, assets_container, adcopy_output)
 
+    except EmptyResponseError:
+        adcopy_placeholder.error("The model returned an empty response for ad copies.")
+        return
     except APIError as e:
         adcopy_placeholder.error(f"❌ Gemini API Error (Ad Copy Generation): {e.message}")
         return
     except Exception as e:
         adcopy_placeholder.error(f"❌ An unexpected error occurred during ad copy generation: {e}")
         return
-            
-    # 5. Display Results
-    adcopy_placeholder.empty()
-    st.markdown("## ✨ Generated Ad Assets")
-    
-    parsed_output = parse_ad_copy_text(raw_ad_copy_text)
 
-    for title, content in parsed_output.items():
-        if title == "Intro":
-            continue
+    # 4. Display Results
+    # The sections are already rendered below the step heading, which now titles them
+    adcopy_placeholder.markdown("## ✨ Generated Ad Assets")
 
-        if not content:
-            continue
+    return internal_marketing_brief, parsed_output
 
-        st.markdown(f"### {title.strip()}")
+def display_saved_result(internal_marketing_brief: str, parsed_output: dict):
+    """Re-renders a previously generated result from memory, without calling Gemini or re-parsing."""
+    st.subheader("Marketing Brief Generation")
+    st.markdown("### 📝 Generated Marketing Brief")
+    show_read_only_text(st, "Marketing Brief", internal_marketing_brief)
 
-        if title.upper().startswith("AD COPY VARIATION"):
-            format_ad_copy_table(content)
-        elif title.upper() == "STRUCTURED SNIPPETS":
-            format_structured_snippets(content)
-        else: # Sitelinks and Callouts
-            # Display raw text for these sections as they are already structured lists
-            st.code(content, language='text')
+    st.markdown("---")
+
+    st.subheader("Ad Copy Generation")
+    st.markdown("## ✨ Generated Ad Assets")
+    for title, content in parsed_output.items():
+        display_ad_copy_section(title, content)
 
 # --- 6. EXECUTION ---
-if generate_button:
-    generate_assets(url, focus_services, website_only)
+
+# Submitting the form or pressing Regenerate reruns only this fragment; the page chrome and footer are left as they are.
+# The chrome itself is still emitted on full reruns, since Streamlit removes elements a rerun does not emit again.
+@st.fragment
+def run_generator():
+    """Renders the form and, when requested, the generated assets."""
+    url, focus_services, website_only, generate_button = render_input_form()
+
+    regenerate_button = st.button(
+        "Regenerate",
+        help="Ignore cached results and call Gemini again for the current inputs."
+    )
+
+    # The last result is kept per session, so later reruns show it again for unchanged inputs instead of losing it
+    inputs = (url, focus_services, website_only)
+    if generate_button or regenerate_button:
+        result = generate_assets(url, focus_services, website_only, refresh=regenerate_button)
+        if result:
+            st.session_state.last_result = (inputs, *result)
+    else:
+        last_result = st.session_state.get("last_result")
+        if last_result and last_result[0] == inputs:
+            display_saved_result(*last_result[1:])
+
+run_generator()
 
 st.markdown("---")
-st.markdown("<footer><p style='text-align:center; color:#6C757D;'>Powered by Gemini API</p></footer>", unsafe_allow_html=True)
+st.markdown(_FOOTER_HTML, unsafe_allow_html=True)
@@ -0,0 +1,84 @@
+from ad_copy_parser import AdCopyParser, parse_ad_copy_text
+
+
+def parse(text):
+    return dict(parse_ad_copy_text(text))
+
+
+def test_numbered_variations_with_colon_are_kept_apart():
+    sections = parse(
+        "AD COPY VARIATION 1: Drain Cleaning\n"
+        "Headlines:\n- Clear Drains Fast\n"
+        "Descriptions:\n- Same-day drain cleaning.\n"
+        "AD COPY VARIATION 2: Emergency Repairs\n"
+        "Headlines:\n- 24/7 Repairs\n"
+        "Descriptions:\n- We come to you any time.\n"
+    )
+    assert sections == {
+        "AD COPY VARIATION 1: Drain Cleaning": {
+            "headlines": ["Clear Drains Fast"], "descriptions": ["Same-day drain cleaning."],
+        },
+        "AD COPY VARIATION 2: Emergency Repairs": {
+            "headlines": ["24/7 Repairs"], "descriptions": ["We come to you any time."],
+        },
+    }
+
+
+def test_bold_titles_followed_by_parenthetical():
+    sections = parse(
+        "**AD COPY VARIATION 1** (Service Focus: HVAC (Heating))\n"
+        "**Headlines:**\n-  Warm Homes Fast \n"
+        "**CALLOUTS** (3 variations)\n"
+        "- Free Quotes\n"
+    )
+    assert sections == {
+        "AD COPY VARIATION 1 (Service Focus: HVAC (Heating))": {"headlines": ["Warm Homes Fast"], "descriptions": []},
+        "CALLOUTS (3 variations)": "- Free Quotes",
+    }
+
+
+def test_dash_separated_and_markdown_heading_titles():
+    sections = parse(
+        "## AD COPY VARIATION 1 - Plumbing\n"
+        "Headlines:\n- Local Plumbers\n"
+        "### Sitelinks\n"
+        "Sitelink Text: Book Now\n"
+    )
+    assert list(sections) == ["AD COPY VARIATION 1 - Plumbing", "Sitelinks"]
+    assert sections["Sitelinks"] == "Sitelink Text: Book Now"
+
+
+def test_prose_starting_with_a_title_word_is_not_a_title():
+    sections = parse(
+        "CALLOUTS:\n"
+        "- Free Shipping\n"
+        "Callouts highlight free shipping\n"
+    )
+    assert sections == {"CALLOUTS": "- Free Shipping\nCallouts highlight free shipping"}
+    assert parse("Sitelinks are great but here's nothing") == {"Intro": "Sitelinks are great but here's nothing"}
+
+
+def test_structured_snippets_keep_unsplit_values():
+    sections = parse(
+        "STRUCTURED SNIPPETS\n"
+        "Header: Types\nValues: X, Y, Z\n"
+        "Header: Services\n- A\n-  B \n"
+    )
+    assert sections["STRUCTURED SNIPPETS"] == [
+        ("Types", [], ["Values: X, Y, Z"]),
+        ("Services", ["A", "B"], []),
+    ]
+
+
+def test_empty_sections_fall_back_to_raw_text():
+    assert parse("SITELINKS:\n\nAD COPY VARIATION 1\nHeadlines:\n") == {
+        "Intro": "SITELINKS:\n\nAD COPY VARIATION 1\nHeadlines:",
+    }
+
+
+def test_feed_reports_the_closed_section():
+    parser = AdCopyParser()
+    assert parser.feed("CALLOUTS:") is None
+    assert parser.feed("- Free Quotes") is None
+    assert parser.feed("SITELINKS (3 variations):") == "CALLOUTS"
+    assert parser.close() == "SITELINKS (3 variations)"